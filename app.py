@@ -1,47 +1,16 @@
-import random
 import streamlit as st
-import pandas as pd
 
+from quiz_core import (
+    build_pool_arrays,
+    build_distractor_index,
+    filter_pool,
+    generate_question,
+    list_topics,
+    load_questions,
+)
 
-# ---------- Data loading ----------
-
-@st.cache_data
-def load_questions(path: str = "better quiz.csv") -> pd.DataFrame:
-    """
-    Load the simple quiz CSV with columns: Topic, Question, Answer.
-    Normalize into: id, topic, question, answer.
-    """
-    df = pd.read_csv(path, encoding="utf-8-sig")
-
-    # Normalise column names (robust to minor header differences)
-    rename_map = {}
-    for col in df.columns:
-        cl = col.lower().strip()
-        if cl == "topic":
-            rename_map[col] = "topic"
-        elif cl == "question":
-            rename_map[col] = "question"
-        elif cl == "answer":
-            rename_map[col] = "answer"
-    df = df.rename(columns=rename_map)
-
-    # Ensure required columns exist
-    for col in ["topic", "question", "answer"]:
-        if col not in df.columns:
-            df[col] = ""
-
-    # Clean text
-    for col in ["topic", "question", "answer"]:
-        df[col] = df[col].fillna("").astype(str).str.strip()
-
-    # Drop completely empty rows
-    df = df[(df["question"] != "") & (df["answer"] != "")].reset_index(drop=True)
-
-    # Auto-generate ids
-    df["id"] = [f"Q-{i+1}" for i in range(len(df))]
-
-    return df
 
+# ---------- Data loading ----------
 
 df_all = load_questions()
 
@@ -54,126 +23,50 @@ if df_all.empty:
 
 st.sidebar.title("Filters")
 
-topics = sorted([t for t in df_all["topic"].unique() if t])
+topics, has_blank_topics = list_topics(df_all)
 topic_choice = st.sidebar.multiselect(
     "Topics",
     options=topics,
     default=topics,  # default: all topics
 )
 
-if topic_choice:
-    df_pool = df_all[df_all["topic"].isin(topic_choice)].copy()
+topics_key = tuple(sorted(topic_choice))
+if not topic_choice or (len(topic_choice) == len(topics) and not has_blank_topics):
+    # Default (everything selected): no mask needed, unless blank-topic
+    # rows exist, which selecting every topic has always left out
+    df_pool = df_all
 else:
-    df_pool = df_all.copy()
+    df_pool = filter_pool(df_all, topics_key)
 
 if df_pool.empty:
     st.error("No questions match the current filters.")
     st.stop()
 
+# Column arrays for the pool, so each draw is a plain integer index
+pool_arrays = build_pool_arrays(df_pool, df_all.attrs["bank_key"], topics_key)
+distractor_index = build_distractor_index(df_all)
+
 st.sidebar.markdown("---")
 st.sidebar.write("Each question: correct vs one distractor (either/or).")
 
 
-# ---------- Helper to build a single question ----------
-
-def generate_question(df_pool: pd.DataFrame, df_all: pd.DataFrame) -> dict:
-    """
-    Pick one random question and build options:
-    - correct = its own Answer
-    - distractor = one other Answer.
-
-    For residency questions (Topic starts with 'Residency rules'):
-      - distractor comes from a *different* residency rules topic.
-    For everything else:
-      - distractor comes from the same topic (fallback to whole bank if needed).
-
-    Ensures distractor text is not the same as the correct answer (after normalisation).
-    """
-
-    def norm(s: str) -> str:
-        # Normalise for comparison: strip, collapse whitespace, lowercase
-        s = (s or "").strip()
-        return " ".join(s.split()).lower()
-
-    row = df_pool.sample(1).iloc[0]
-
-    qid = row["id"]
-    topic = row["topic"]
-    question_text = row["question"]
-    correct = row["answer"]
-    correct_norm = norm(correct)
-
-    # --- Choose candidate distractors depending on topic type ---
-
-    topic_str = str(topic)
-    topic_lower = topic_str.lower()
-
-    if topic_lower.startswith("residency rules"):
-        # All residency rows
-        residency_mask = df_all["topic"].str.lower().str.startswith("residency rules")
-
-        # Candidates = other residency topics (different from current topic)
-        candidate_rows = df_all[
-            residency_mask
-            & (df_all["topic"] != topic_str)
-            & (df_all["id"] != qid)
-        ]
-    else:
-        # Default behaviour: same topic
-        candidate_rows = df_all[
-            (df_all["topic"] == topic_str)
-            & (df_all["id"] != qid)
-        ]
-
-    candidates = candidate_rows["answer"].dropna().unique().tolist()
-
-    # Filter out empties and anything equal to the correct answer (after normalisation)
-    filtered = []
-    for c in candidates:
-        c_str = str(c).strip()
-        if not c_str:
-            continue
-        if norm(c_str) == correct_norm:
-            continue
-        filtered.append(c_str)
-
-    # --- If none, fall back to anywhere in the bank ---
-    if not filtered:
-        others = df_all[df_all["id"] != qid]["answer"].dropna().unique().tolist()
-        for c in others:
-            c_str = str(c).strip()
-            if not c_str:
-                continue
-            if norm(c_str) == correct_norm:
-                continue
-            filtered.append(c_str)
-
-    # Final choice
-    if not filtered:
-        distractor = "No distractor available"
-    else:
-        distractor = random.choice(filtered)
-
-    options = [correct, distractor]
-    random.shuffle(options)
-
-    return {
-        "id": qid,
-        "topic": topic_str,
-        "question": question_text,
-        "correct": correct,
-        "options": options,
-    }
-
-
 # ---------- Minimal session state ----------
 
 ss = st.session_state
 
-if "current_q" not in ss:
-    ss.current_q = None  # dict with id/topic/question/correct/options
-if "feedback" not in ss:
-    ss.feedback = None   # None / "correct" / "incorrect"
+_defaults = {
+    "current_q": None,  # (id, topic, question, correct, options) tuple
+    "feedback": None,   # None / "correct" / "incorrect"
+}
+for key, value in _defaults.items():
+    ss.setdefault(key, value)
+
+# Ids in the current pool, rebuilt only when the bank or the topic filter
+# changes (the same key the cached pool arrays use)
+pool_key = (df_all.attrs["bank_key"], topics_key)
+if ss.get("pool_key") != pool_key:
+    ss.pool_key = pool_key
+    ss.pool_id_set = frozenset(pool_arrays[0].tolist())
 
 
 def reset_radio():
@@ -183,14 +76,15 @@ def reset_radio():
 
 
 def new_question():
-    ss.current_q = generate_question(df_pool, df_all)
+    # Stored as a plain tuple; unpacked into locals at render time
+    ss.current_q = tuple(generate_question(pool_arrays, distractor_index))
     ss.feedback = None
     reset_radio()
 
 
 # Initialise a question, or refresh it if filters changed so that
 # the current question is no longer in the pool.
-if ss.current_q is None or ss.current_q["id"] not in df_pool["id"].values:
+if ss.current_q is None or ss.current_q[0] not in ss.pool_id_set:
     new_question()
 
 # ---------- Main UI ----------
@@ -202,20 +96,20 @@ if st.button("Next question"):
     new_question()
 
 # Now, after any potential update, get the current question to display
-q = ss.current_q
+qid, q_topic, q_text, q_correct, q_options = ss.current_q
 
 st.markdown("---")
 
 # --- Question + answer form ---
 with st.form("qa_form"):
-    if q["topic"]:
-        st.markdown(f"**{q['topic']}**")
+    if q_topic:
+        st.markdown(f"**{q_topic}**")
 
-    st.markdown(f"### {q['question']}")
+    st.markdown(f"### {q_text}")
 
     selected = st.radio(
         "Select your answer:",
-        q["options"],
+        q_options,
         key="answer_radio",
     )
 
@@ -223,7 +117,7 @@ with st.form("qa_form"):
 
 # Handle check after the form is submitted
 if check:
-    if selected == q["correct"]:
+    if selected == q_correct:
         ss.feedback = "correct"
     else:
         ss.feedback = "incorrect"
@@ -235,6 +129,6 @@ if ss.feedback == "correct":
 elif ss.feedback == "incorrect":
     st.error("❌ Incorrect.")
     with st.expander("See the correct answer"):
-        st.markdown(f"**Correct answer:**  \n{q['correct']}")
+        st.markdown(f"**Correct answer:**  \n{q_correct}")
 else:
     st.info("Pick one of the two options and click **Check answer**.")
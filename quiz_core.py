@@ -0,0 +1,247 @@
+import logging
+import os
+import random
+import tempfile
+from collections import namedtuple
+from pathlib import Path
+
+import numpy as np
+import streamlit as st
+import pandas as pd
+
+logger = logging.getLogger(__name__)
+
+
+# ---------- Data loading ----------
+
+@st.cache_data
+def load_questions(path: str = "better quiz.csv") -> pd.DataFrame:
+    """
+    Load the simple quiz CSV with columns: Topic, Question, Answer.
+    Normalize into: id, topic, question, answer.
+
+    The cleaned bank is cached next to the CSV as Parquet and reused
+    until the CSV is modified again.
+    """
+    csv_path = Path(path)
+    pq_path = csv_path.with_suffix(".parquet")
+
+    df = None
+    if pq_path.exists() and pq_path.stat().st_mtime >= csv_path.stat().st_mtime:
+        try:
+            df = pd.read_parquet(pq_path, columns=["topic", "question", "answer"])
+        except (ImportError, OSError, ValueError) as exc:
+            # Unreadable cache (e.g. truncated write): rebuild it from the CSV
+            logger.warning("Ignoring unreadable Parquet cache %s: %s", pq_path, exc)
+
+    if df is None:
+        df = _read_questions_csv(csv_path)
+        _write_parquet_cache(df, pq_path, mode=csv_path.stat().st_mode & 0o666)
+
+    # Auto-generate ids
+    df["id"] = [f"Q-{i+1}" for i in range(len(df))]
+
+    # Derived columns, computed once per load rather than per question
+    df["_is_residency"] = df["topic"].str.lower().str.startswith("residency rules")
+    # Answer normalised for comparison: strip, collapse whitespace, casefold
+    # (str.split handles all Unicode whitespace, e.g. NBSP from Excel/Word)
+    df["_answer_norm"] = df["answer"].str.split().str.join(" ").str.casefold()
+
+    # Fingerprint of the loaded bank (ids are positional, so they are
+    # included); kept in attrs so it survives slicing and cache pickling
+    df.attrs["bank_key"] = int(
+        pd.util.hash_pandas_object(df[["id", "topic", "question", "answer"]], index=False).sum()
+    )
+
+    return df
+
+
+def _write_parquet_cache(df: pd.DataFrame, pq_path: Path, mode: int) -> None:
+    """
+    Write the cache atomically: a temp file in the same directory is
+    moved into place, so readers never see a partially written file.
+    The file gets the given permission bits (mkstemp creates it as 0600).
+    """
+    tmp_name = None
+    try:
+        fd, tmp_name = tempfile.mkstemp(
+            dir=pq_path.parent, prefix=f".{pq_path.name}.", suffix=".tmp"
+        )
+        os.close(fd)
+        df.to_parquet(tmp_name, compression="zstd", index=False)
+        os.chmod(tmp_name, mode)
+        os.replace(tmp_name, pq_path)
+    except (ImportError, OSError):
+        # No Parquet engine, read-only directory or full disk: just use the CSV
+        pass
+    finally:
+        # Only left behind if the write or the replace failed
+        if tmp_name is not None and os.path.exists(tmp_name):
+            try:
+                os.remove(tmp_name)
+            except OSError:
+                pass
+
+
+def _read_questions_csv(path: Path) -> pd.DataFrame:
+    """
+    Parse and clean the CSV into: topic, question, answer.
+    """
+    df = pd.read_csv(
+        path,
+        encoding="utf-8-sig",
+        engine="c",
+        dtype=str,
+        keep_default_na=False,
+        na_filter=False,
+        usecols=lambda c: c.strip().lower() in {"topic", "question", "answer"},
+    )
+
+    text_cols = ["topic", "question", "answer"]
+
+    # Normalise column names (robust to minor header differences);
+    # usecols above already limited these to the known set
+    df.columns = [c.strip().lower() for c in df.columns]
+
+    # Ensure required columns exist
+    for col in text_cols:
+        if col not in df.columns:
+            df[col] = ""
+
+    # Clean text (already str and NaN-free thanks to dtype/na_filter)
+    for col in text_cols:
+        df[col] = df[col].str.strip()
+
+    # Drop completely empty rows, selecting the columns in the same step
+    keep = (df["question"] != "") & (df["answer"] != "")
+    return df.loc[keep, text_cols].reset_index(drop=True)
+
+
+Candidates = tuple[np.ndarray, np.ndarray]
+
+
+@st.cache_data
+def build_distractor_index(df: pd.DataFrame) -> tuple[dict[str, Candidates], Candidates]:
+    """
+    Precompute distractor candidates for every topic.
+
+    Returns (index, all_answers) where index maps topic -> the unique
+    answers a question from that topic may draw its distractor from, and
+    all_answers covers every unique answer in the bank (the fallback).
+    Each entry is a (normalised, original) pair of parallel arrays with
+    one row per distinct normalised answer.
+
+    Residency rules topics map to the answers of the *other* residency
+    rules topics; every other topic maps to its own answers.
+    """
+
+    def candidates(rows: pd.DataFrame) -> Candidates:
+        rows = rows.drop_duplicates("_answer_norm")
+        return rows["_answer_norm"].to_numpy(), rows["answer"].to_numpy()
+
+    index = {}
+    for topic, rows in df.groupby("topic", sort=False):
+        if rows["_is_residency"].iat[0]:
+            rows = df[df["_is_residency"] & (df["topic"] != topic)]
+        index[topic] = candidates(rows)
+
+    return index, candidates(df)
+
+
+@st.cache_data
+def filter_pool(df_all: pd.DataFrame, topics_key: tuple) -> pd.DataFrame:
+    """
+    Rows of df_all whose topic is in topics_key (all rows if it is empty).
+    Cached per topic selection, so reruns with the same filters skip the mask.
+    """
+    if not topics_key:
+        return df_all
+    return df_all[df_all["topic"].isin(topics_key)]
+
+
+@st.cache_resource(max_entries=32)
+def build_pool_arrays(
+    _df_pool: pd.DataFrame, bank_key: int, topics_key: tuple
+) -> tuple[np.ndarray, ...]:
+    """
+    Column arrays (id, topic, question, answer, _answer_norm) of the pool,
+    so each draw is a plain integer index.
+
+    Keyed on the bank fingerprint and topic selection; _df_pool itself is
+    not hashed. A resource cache hands back the same arrays on every rerun
+    instead of unpickling a fresh copy as st.cache_data would.
+    """
+    cols = ["id", "topic", "question", "answer", "_answer_norm"]
+    return tuple(_df_pool[col].to_numpy() for col in cols)
+
+
+@st.cache_data
+def list_topics(df: pd.DataFrame) -> tuple[list[str], bool]:
+    """
+    Sorted unique non-empty topics, plus whether any row has a blank topic.
+    """
+    topics_arr = np.unique(df["topic"].to_numpy())
+    has_blank = bool(len(topics_arr)) and topics_arr[0] == ""
+    return topics_arr[topics_arr != ""].tolist(), has_blank
+
+
+# ---------- Helper to build a single question ----------
+
+# Generator bound once for the per-click draws
+_rng = random.Random()
+_randrange = _rng.randrange
+_getrandbits = _rng.getrandbits
+
+Question = namedtuple("Question", "id topic question correct options")
+
+
+def generate_question(
+    pool_arrays: tuple[np.ndarray, ...],
+    distractors: tuple[dict[str, Candidates], Candidates],
+) -> Question:
+    """
+    Pick one random question and build options:
+    - correct = its own Answer
+    - distractor = one other Answer.
+
+    For residency questions (Topic starts with 'Residency rules'):
+      - distractor comes from a *different* residency rules topic.
+    For everything else:
+      - distractor comes from the same topic (fallback to whole bank if needed).
+
+    Candidate pools come precomputed from build_distractor_index.
+
+    Ensures distractor text is not the same as the correct answer (after normalisation).
+    """
+
+    def pick(pool: Candidates):
+        # Drop anything equal to the correct answer (after normalisation)
+        normalized, original = pool
+        cands = original[normalized != correct_norm]
+        return cands[_randrange(len(cands))] if len(cands) else None
+
+    pool_ids, pool_topics, pool_questions, pool_answers, pool_norms = pool_arrays
+    i = _randrange(len(pool_ids))
+
+    qid = pool_ids[i]
+    topic = pool_topics[i]
+    question_text = pool_questions[i]
+    correct = pool_answers[i]
+    correct_norm = pool_norms[i]
+
+    topic_str = str(topic)
+    index, all_answers = distractors
+
+    distractor = pick(index.get(topic_str, all_answers))
+
+    # --- If none, fall back to anywhere in the bank ---
+    if distractor is None:
+        distractor = pick(all_answers)
+
+    # Final choice
+    if distractor is None:
+        distractor = "No distractor available"
+
+    options = (correct, distractor) if _getrandbits(1) else (distractor, correct)
+
+    return Question(qid, topic_str, question_text, correct, options)